@@ -5,6 +5,16 @@ from datetime import datetime, timedelta
 import numpy as np
 import logging
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from numba import njit
+except ImportError:
+    # numba is optional; without it the numeric kernels run as plain Python
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
 
 # Configure logging for notifications
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -18,139 +28,246 @@ def initialize_mt5():
     logger.info("MetaTrader5 initialized successfully")
     return True
 
-# Fetch historical data for a currency pair
+# Keep only symbols the terminal knows about, so bad names don't cost a failed fetch every cycle
+def validate_symbols(currency_pairs):
+    valid_pairs = []
+    for symbol in currency_pairs:
+        if mt5.symbol_info(symbol) is None:
+            logger.warning("Symbol %s not found in MetaTrader5, skipping", symbol)
+            continue
+        valid_pairs.append(symbol)
+    return valid_pairs
+
+# Last `num_bars` bars per (symbol, timeframe), kept between cycles so only fresh bars are requested
+rates_cache = {}
+
+# Refresh cached bars by fetching only the two most recent ones
+# Returns None when the cache can't be spliced (first run, or more than one new bar since last fetch)
+def update_cached_rates(symbol, timeframe, num_bars):
+    cached = rates_cache.get((symbol, timeframe))
+    if cached is None or len(cached) != num_bars:
+        return None
+    latest = mt5.copy_rates_from_pos(symbol, timeframe, 0, 2)
+    if latest is None or len(latest) != 2:
+        return None
+    # The older fresh bar must still be in the cache for the splice to be gap-free
+    idx = np.searchsorted(cached['time'], latest['time'][0])
+    if idx >= len(cached) or cached['time'][idx] != latest['time'][0]:
+        return None
+    return np.concatenate((cached[:idx], latest))[-num_bars:]
+
+# Fetch historical data for a currency pair as a dict of column arrays
 def fetch_data(symbol, timeframe, num_bars):
-    rates = mt5.copy_rates_from_pos(symbol, timeframe, 0, num_bars)
+    rates = update_cached_rates(symbol, timeframe, num_bars)
+    if rates is None:
+        rates = mt5.copy_rates_from_pos(symbol, timeframe, 0, num_bars)
     if rates is None or len(rates) == 0:
-        logger.error(f"Failed to fetch data for {symbol}")
+        logger.error("Failed to fetch data for %s", symbol)
         return None
-    df = pd.DataFrame(rates)
-    df['time'] = pd.to_datetime(df['time'], unit='s')
-    return df
-
-# Calculate ATR for volatility
-def calculate_atr(df, period=14):
-    df['high_low'] = df['high'] - df['low']
-    df['high_prev_close'] = abs(df['high'] - df['close'].shift(1))
-    df['low_prev_close'] = abs(df['low'] - df['close'].shift(1))
-    df['true_range'] = df[['high_low', 'high_prev_close', 'low_prev_close']].max(axis=1)
-    df['atr'] = df['true_range'].rolling(window=period).mean()
-    return df['atr'].iloc[-1]
+    rates_cache[(symbol, timeframe)] = rates
+    # Column views over the MT5 record array; no DataFrame or datetime parsing needed
+    return {
+        'open': rates['open'],
+        'high': rates['high'],
+        'low': rates['low'],
+        'close': rates['close'],
+        'tick_volume': rates['tick_volume']
+    }
 
-# Calculate percentage price change
-def calculate_price_change(df):
-    current_price = df['close'].iloc[-1]
-    previous_price = df['close'].iloc[0]
-    return ((current_price - previous_price) / previous_price) * 100
+# Split a symbol such as "EURUSDm" into its (base, quote) currencies
+def split_symbol(symbol):
+    return symbol[:3], symbol[3:-1] if symbol.endswith('m') else symbol[3:]
 
-# Detect smart money activity (volume spikes and reversals)
-def detect_smart_money(df, volume_threshold=1.5, reversal_threshold=0.0003):
-    avg_volume = df['tick_volume'].rolling(window=14).mean().iloc[-1]
-    current_volume = df['tick_volume'].iloc[-1]
-    volume_spike = current_volume > (avg_volume * volume_threshold)
-    prev_high = df['high'].iloc[-2]
-    prev_low = df['low'].iloc[-2]
-    current_close = df['close'].iloc[-1]
-    bullish_reversal = (df['low'].iloc[-1] <= prev_low and 
-                       current_close >= prev_high - reversal_threshold and 
-                       current_close > df['open'].iloc[-1])
-    bearish_reversal = (df['high'].iloc[-1] >= prev_high and 
-                        current_close <= prev_low + reversal_threshold and 
-                        current_close < df['open'].iloc[-1])
-    smart_money_detected = volume_spike and (bullish_reversal or bearish_reversal)
+# Stack per-symbol column arrays into contiguous float64 (n_pairs, num_bars) arrays
+def stack_bars(bars_list):
     return {
-        'smart_money': smart_money_detected,
-        'volume_spike': volume_spike,
-        'bullish_reversal': bullish_reversal,
-        'bearish_reversal': bearish_reversal
+        column: np.stack([bars[column] for bars in bars_list]).astype(np.float64, copy=False)
+        for column in bars_list[0]
     }
 
+# Calculate ATR for volatility using Wilder smoothing (RMA)
+@njit(cache=True, fastmath=True)
+def calculate_atr(high, low, close, period=14):
+    num_bars = len(high)
+    if num_bars < period:
+        return np.nan
+    # Wilder seeds with the simple mean of the first `period` true ranges,
+    # then smooths each later bar: atr = atr_prev * (period - 1) / period + tr / period
+    # The first bar has no previous close, so its true range is just high - low
+    atr = (high[0] - low[0]) / period
+    for i in range(1, num_bars):
+        true_range = max(high[i] - low[i], abs(high[i] - close[i - 1]), abs(low[i] - close[i - 1]))
+        if i < period:
+            atr += true_range / period
+        else:
+            atr += (true_range - atr) / period
+    return atr
+
+# Calculate percentage price change
+@njit(cache=True, fastmath=True)
+def calculate_price_change(close):
+    return ((close[-1] - close[0]) / close[0]) * 100
+
+# Build a smart money detector (volume spikes and reversals) with its thresholds baked in
+# The thresholds are closure constants, so numba folds them into the compiled comparisons
+def make_smart_money_detector(volume_threshold=1.5, reversal_threshold=0.0003):
+    @njit(fastmath=True)
+    def detect_smart_money(high, low, close, open_, volume):
+        # Average over the last 14 bars (including the current one); no spike if fewer are available
+        volume_spike = len(volume) >= 14 and volume[-1] > volume[-14:].mean() * volume_threshold
+        prev_high = high[-2]
+        prev_low = low[-2]
+        current_close = close[-1]
+        bullish_reversal = (low[-1] <= prev_low and
+                            current_close >= prev_high - reversal_threshold and
+                            current_close > open_[-1])
+        bearish_reversal = (high[-1] >= prev_high and
+                            current_close <= prev_low + reversal_threshold and
+                            current_close < open_[-1])
+        smart_money_detected = volume_spike and (bullish_reversal or bearish_reversal)
+        return smart_money_detected, volume_spike, bullish_reversal, bearish_reversal
+    return detect_smart_money
+
+detect_smart_money = make_smart_money_detector(volume_threshold=1.5, reversal_threshold=0.0003)
+
+# Run the per-pair kernels over every row of the stacked bars
+@njit(cache=True, fastmath=True)
+def scan_pairs(high, low, close, open_, volume, period=14):
+    num_pairs = high.shape[0]
+    atr = np.empty(num_pairs)
+    price_change = np.empty(num_pairs)
+    smart_money = np.empty(num_pairs, dtype=np.bool_)
+    volume_spike = np.empty(num_pairs, dtype=np.bool_)
+    bullish_reversal = np.empty(num_pairs, dtype=np.bool_)
+    bearish_reversal = np.empty(num_pairs, dtype=np.bool_)
+    for p in range(num_pairs):
+        atr[p] = calculate_atr(high[p], low[p], close[p], period)
+        price_change[p] = calculate_price_change(close[p])
+        smart_money[p], volume_spike[p], bullish_reversal[p], bearish_reversal[p] = detect_smart_money(
+            high[p], low[p], close[p], open_[p], volume[p]
+        )
+    return atr, price_change, smart_money, volume_spike, bullish_reversal, bearish_reversal
+
+# Scale a metric column to the 0..1 range across pairs
+def normalize(values):
+    value_range = values.max() - values.min()
+    return (values - values.min()) / (value_range or 1)
+
+# Yield scored pairs best first (score, then ATR as tiebreaker)
+# Only the top `k` are ranked up front; the rest are sorted only if the caller keeps iterating
+def iter_by_score(pair_scores, k=10):
+    top = pair_scores.nlargest(k, ['score', 'atr'])
+    yield from top.itertuples()
+    if len(top) < len(pair_scores):
+        rest = pair_scores.drop(top.index).sort_values(['score', 'atr'], ascending=False)
+        yield from rest.itertuples()
+
 # Select the top three pairs to trade, avoiding clustering
-def select_top_three_pairs(pair_volatility, thresholds):
-    if not pair_volatility:
+def select_top_three_pairs(pair_volatility, thresholds, symbol_currencies):
+    if pair_volatility.empty:
         return []
     
-    # Calculate scores for each pair
-    atr_values = [metrics['atr'] for metrics in pair_volatility.values()]
-    price_change_values = [abs(metrics['price_change']) for metrics in pair_volatility.values()]
-    atr_range = max(atr_values) - min(atr_values) if max(atr_values) != min(atr_values) else 1
-    price_change_range = max(price_change_values) - min(price_change_values) if max(price_change_values) != min(price_change_values) else 1
-    
-    pair_scores = []
-    for symbol, metrics in pair_volatility.items():
-        if metrics['atr'] < thresholds['atr'] and abs(metrics['price_change']) < thresholds['price_change']:
-            continue
-        normalized_atr = (metrics['atr'] - min(atr_values)) / atr_range
-        normalized_price_change = (abs(metrics['price_change']) - min(price_change_values)) / price_change_range
-        score = (0.5 * normalized_atr) + (0.3 * normalized_price_change)
-        if metrics['smart_money']:
-            score += 0.2
-        pair_scores.append({
-            'symbol': symbol,
-            'score': score,
-            'atr': metrics['atr'],
-            'price_change': metrics['price_change'],
-            'smart_money': metrics['smart_money']
-        })
+    # Drop pairs below both thresholds first so they don't skew the normalization
+    eligible = (
+        (pair_volatility['atr'] >= thresholds['atr']) |
+        (pair_volatility['abs_price_change'] >= thresholds['price_change'])
+    )
+    survivors = pair_volatility[eligible]
     
-    if not pair_scores:
+    if survivors.empty:
         return []
     
-    # Sort by score and ATR (tiebreaker)
-    pair_scores.sort(key=lambda x: (x['score'], x['atr']), reverse=True)
+    # Score the surviving pairs in one vectorized pass
+    score = (
+        (0.5 * normalize(survivors['atr'])) +
+        (0.3 * normalize(survivors['abs_price_change'])) +
+        (0.2 * survivors['smart_money'])
+    )
+    pair_scores = survivors.assign(score=score)
     
     # Select top three pairs, avoiding clustering
     selected_pairs = []
     used_currencies = set()
-    for pair in pair_scores:
+    for pair in iter_by_score(pair_scores):
         if len(selected_pairs) >= 3:
             break
-        base, quote = pair['symbol'][:3], pair['symbol'][3:-1] if pair['symbol'].endswith('m') else pair['symbol'][3:]
+        base, quote = symbol_currencies[pair.Index]
         if base not in used_currencies and quote not in used_currencies:
-            selected_pairs.append(pair)
+            selected_pairs.append({
+                'symbol': pair.Index,
+                'score': pair.score,
+                'atr': pair.atr,
+                'price_change': pair.price_change,
+                'smart_money': pair.smart_money
+            })
             used_currencies.add(base)
             used_currencies.add(quote)
     
     return selected_pairs
 
+# Per-pair metrics stored as columns of the pair_volatility frame, with their dtypes
+PAIR_COLUMNS = {
+    'atr': np.float64,
+    'price_change': np.float64,
+    'abs_price_change': np.float64,
+    'smart_money': np.bool_,
+    'volume_spike': np.bool_,
+    'bullish_reversal': np.bool_,
+    'bearish_reversal': np.bool_
+}
+
 # Rank currencies by aggregated volatility and check for smart money
-def rank_currencies(currency_pairs, timeframe, num_bars):
-    currency_volatility = {}
-    pair_volatility = {}
+# `currencies` lists every currency once; `symbol_currency_ids` maps a symbol to its (base, quote) indices into it
+def rank_currencies(currency_pairs, timeframe, num_bars, currencies, symbol_currency_ids):
+    # Fetch all pairs concurrently; each request is an IPC round trip to the terminal
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        fetched = list(executor.map(lambda symbol: fetch_data(symbol, timeframe, num_bars), currency_pairs))
     
-    for symbol in currency_pairs:
-        df = fetch_data(symbol, timeframe, num_bars)
-        if df is None:
+    symbols = []
+    bars_list = []
+    for symbol, bars in zip(currency_pairs, fetched):
+        if bars is None:
             continue
-        atr = calculate_atr(df)
-        price_change = calculate_price_change(df)
-        smart_money_metrics = detect_smart_money(df)
-        pair_volatility[symbol] = {
-            'atr': atr,
-            'price_change': price_change,
-            'smart_money': smart_money_metrics['smart_money'],
-            'volume_spike': smart_money_metrics['volume_spike'],
-            'bullish_reversal': smart_money_metrics['bullish_reversal'],
-            'bearish_reversal': smart_money_metrics['bearish_reversal']
-        }
-        base, quote = symbol[:3], symbol[3:-1] if symbol.endswith('m') else symbol[3:]
-        for currency in [base, quote]:
-            if currency not in currency_volatility:
-                currency_volatility[currency] = {'total_atr': 0, 'count': 0}
-            currency_volatility[currency]['total_atr'] += atr
-            currency_volatility[currency]['count'] += 1
+        if len(bars['close']) < num_bars:
+            logger.warning("Only %d of %d bars available for %s, skipping", len(bars['close']), num_bars, symbol)
+            continue
+        symbols.append(symbol)
+        bars_list.append(bars)
     
-    for currency in currency_volatility:
-        currency_volatility[currency]['avg_atr'] = (
-            currency_volatility[currency]['total_atr'] / currency_volatility[currency]['count']
+    if not bars_list:
+        # Same columns and dtypes as a populated frame, so consumers need no special case
+        empty = pd.DataFrame(
+            {column: np.empty(0, dtype=dtype) for column, dtype in PAIR_COLUMNS.items()},
+            index=pd.Index([], name='symbol', dtype=object)
         )
+        return [], empty
     
-    ranked_currencies = sorted(
-        currency_volatility.items(),
-        key=lambda x: x[1]['avg_atr'],
-        reverse=True
+    # Compute metrics for all pairs in one vectorized pass
+    batch = stack_bars(bars_list)
+    atr_values, price_change_values, smart_money, volume_spike, bullish_reversal, bearish_reversal = scan_pairs(
+        batch['high'], batch['low'], batch['close'], batch['open'], batch['tick_volume']
     )
     
+    # One column per metric, one row per symbol
+    pair_volatility = pd.DataFrame({
+        'atr': atr_values,
+        'price_change': price_change_values,
+        'abs_price_change': np.abs(price_change_values),
+        'smart_money': smart_money,
+        'volume_spike': volume_spike,
+        'bullish_reversal': bullish_reversal,
+        'bearish_reversal': bearish_reversal
+    }, index=pd.Index(symbols, name='symbol'))
+    
+    # Each pair adds its ATR to both its base and quote currency, accumulated by currency index
+    currency_ids = np.array([symbol_currency_ids[symbol] for symbol in symbols]).ravel()
+    total_atr = np.bincount(currency_ids, weights=np.repeat(atr_values, 2), minlength=len(currencies))
+    count = np.bincount(currency_ids, minlength=len(currencies))
+    active = np.flatnonzero(count)
+    avg_atr = total_atr[active] / count[active]
+    
+    ranked_currencies = [(currencies[active[i]], avg_atr[i]) for i in np.argsort(-avg_atr)]
+    
     return ranked_currencies, pair_volatility
 
 # Check for notification triggers, ensuring at least three high activity pairs
@@ -158,45 +275,36 @@ def check_notifications(pair_volatility, thresholds):
     notifications = []
     
     # Collect high activity pairs
-    high_activity_pairs = []
-    for symbol, metrics in pair_volatility.items():
-        if metrics['atr'] > thresholds['atr'] or abs(metrics['price_change']) > thresholds['price_change']:
-            high_activity_pairs.append({
-                'symbol': symbol,
-                'atr': metrics['atr'],
-                'price_change': metrics['price_change']
-            })
-    
-    # Sort by ATR to prioritize most volatile pairs
-    high_activity_pairs.sort(key=lambda x: x['atr'], reverse=True)
+    high_activity_pairs = pair_volatility[
+        (pair_volatility['atr'] > thresholds['atr']) |
+        (pair_volatility['abs_price_change'] > thresholds['price_change'])
+    ]
     
-    # Select at least three pairs (or more if tied)
-    selected_high_activity = []
-    if high_activity_pairs:
-        third_atr = high_activity_pairs[min(2, len(high_activity_pairs) - 1)]['atr'] if len(high_activity_pairs) >= 3 else high_activity_pairs[-1]['atr']
-        for pair in high_activity_pairs:
-            if len(selected_high_activity) < 3 or pair['atr'] >= third_atr:
-                selected_high_activity.append(pair)
-            else:
-                break
+    # Select at least three pairs (or more if tied); np.partition finds the third-highest ATR in O(P)
+    selected_high_activity = high_activity_pairs
+    atr_values = high_activity_pairs['atr'].to_numpy()
+    if len(atr_values) > 3:
+        third_atr = np.partition(atr_values, -3)[-3]
+        selected_high_activity = high_activity_pairs[atr_values >= third_atr]
+    # Only the few selected pairs are sorted, to report the most volatile first
+    selected_high_activity = selected_high_activity.sort_values('atr', ascending=False)
     
     # Add high activity notifications
-    for pair in selected_high_activity:
+    for pair in selected_high_activity.itertuples():
         message = (
-            f"High activity detected in {pair['symbol']}: "
-            f"ATR={pair['atr']:.5f}, Price Change={pair['price_change']:.2f}%"
+            f"High activity detected in {pair.Index}: "
+            f"ATR={pair.atr:.5f}, Price Change={pair.price_change:.2f}%"
         )
         notifications.append(message)
     
     # Add smart money notifications (not limited)
-    for symbol, metrics in pair_volatility.items():
-        if metrics['smart_money']:
-            reversal_type = "Bullish" if metrics['bullish_reversal'] else "Bearish"
-            message = (
-                f"Smart money activity detected in {symbol}: "
-                f"{reversal_type} reversal with volume spike"
-            )
-            notifications.append(message)
+    for symbol, bullish_reversal in pair_volatility.loc[pair_volatility['smart_money'], 'bullish_reversal'].items():
+        reversal_type = "Bullish" if bullish_reversal else "Bearish"
+        message = (
+            f"Smart money activity detected in {symbol}: "
+            f"{reversal_type} reversal with volume spike"
+        )
+        notifications.append(message)
     
     # If fewer than three high activity pairs, log a note
     if len(selected_high_activity) < 3:
@@ -215,47 +323,67 @@ def monitor_forex(currency_pairs, thresholds, interval=1800):
     }
     
     try:
+        currency_pairs = validate_symbols(currency_pairs)
+        if not currency_pairs:
+            logger.error("No valid symbols to monitor")
+            return
+        
+        # Currencies never change per symbol, so split them once up front
+        symbol_currencies = {symbol: split_symbol(symbol) for symbol in currency_pairs}
+        currencies = sorted({currency for pair in symbol_currencies.values() for currency in pair})
+        currency_index = {currency: i for i, currency in enumerate(currencies)}
+        symbol_currency_ids = {
+            symbol: (currency_index[base], currency_index[quote])
+            for symbol, (base, quote) in symbol_currencies.items()
+        }
+        
+        # Schedule cycles against a monotonic deadline so fetch/compute time doesn't accumulate as drift
+        deadline = time.monotonic()
         while True:
             for timeframe_name, (timeframe, num_bars) in timeframes.items():
-                logger.info(f"Monitoring {timeframe_name} timeframe...")
+                logger.info("Monitoring %s timeframe...", timeframe_name)
                 
-                ranked_currencies, pair_volatility = rank_currencies(currency_pairs, timeframe, num_bars)
+                ranked_currencies, pair_volatility = rank_currencies(
+                    currency_pairs, timeframe, num_bars, currencies, symbol_currency_ids
+                )
                 
                 # Select top three pairs to trade
-                top_three_pairs = select_top_three_pairs(pair_volatility, thresholds)
+                top_three_pairs = select_top_three_pairs(pair_volatility, thresholds, symbol_currencies)
                 if top_three_pairs:
-                    logger.info(f"Best pair to trade ({timeframe_name}):")
+                    logger.info("Best pair to trade (%s):", timeframe_name)
                     for pair in top_three_pairs:
                         smart_money_flag = " (Smart Money)" if pair['smart_money'] else ""
                         logger.info(
-                            f"{pair['symbol']}: Score={pair['score']:.3f}, "
-                            f"ATR={pair['atr']:.5f}, Price Change={pair['price_change']:.2f}%{smart_money_flag}"
+                            "%s: Score=%.3f, ATR=%.5f, Price Change=%.2f%%%s",
+                            pair['symbol'], pair['score'], pair['atr'], pair['price_change'], smart_money_flag
                         )
                 else:
-                    logger.info(f"No suitable pairs to trade ({timeframe_name})")
+                    logger.info("No suitable pairs to trade (%s)", timeframe_name)
                 
-                logger.info(f"Top active currencies ({timeframe_name}):")
-                for currency, metrics in ranked_currencies[:3]:
-                    logger.info(f"{currency}: Avg ATR={metrics['avg_atr']:.5f}")
+                logger.info("Top active currencies (%s):", timeframe_name)
+                for currency, avg_atr in ranked_currencies[:3]:
+                    logger.info("%s: Avg ATR=%.5f", currency, avg_atr)
                 
                 notifications = check_notifications(pair_volatility, thresholds)
                 for notification in notifications:
                     logger.info(notification)
                 
-                logger.info(f"Active pairs ({timeframe_name}):")
-                for symbol, metrics in sorted(
-                    pair_volatility.items(),
-                    key=lambda x: x[1]['atr'],
-                    reverse=True
-                )[:5]:
-                    smart_money_flag = " (Smart Money)" if metrics['smart_money'] else ""
-                    logger.info(
-                        f"{symbol}: ATR={metrics['atr']:.5f}, "
-                        f"Price Change={metrics['price_change']:.2f}%{smart_money_flag}"
-                    )
+                logger.info("Active pairs (%s):", timeframe_name)
+                if not pair_volatility.empty:
+                    for pair in pair_volatility.nlargest(5, 'atr').itertuples():
+                        smart_money_flag = " (Smart Money)" if pair.smart_money else ""
+                        logger.info(
+                            "%s: ATR=%.5f, Price Change=%.2f%%%s",
+                            pair.Index, pair.atr, pair.price_change, smart_money_flag
+                        )
             
-            logger.info(f"Waiting {interval} seconds before next check...")
-            time.sleep(interval)
+            deadline += interval
+            now = time.monotonic()
+            if deadline < now:
+                # A cycle overran the interval; start the next one now instead of running to catch up
+                deadline = now
+            logger.info("Waiting %.0f seconds before next check...", deadline - now)
+            time.sleep(deadline - now)
             
     except KeyboardInterrupt:
         logger.info("Monitoring stopped by user")
@@ -268,7 +396,7 @@ if __name__ == "__main__":
         "EURUSDm", "EURGBPm","EURCHFm","EURCADm","EURNZDm", "EURJPYm","EURAUDm",
         "GBPUSDm", "GBPJPYm","GBPCHFm","GBPAUDm","GBPNZDm","GBPCADm",
         "AUDUSDm", "AUDNZDm","AUDCADm","AUDJPYm", "AUDCHFm",
-        "NZDUSDm","NZDJPYm","NZDCHFm","NZDCADm"
+        "NZDUSDm","NZDJPYm","NZDCHFm","NZDCADm",
         "USDCADm", "USDCHFm", "USDJPYm",
         "CHFJPYm", "CADCHFm","CADJPYm",
     ]